@@ -19,14 +19,19 @@ in a single request, avoiding rate limiting issues.
 """
 
 import io
+import json
+import tempfile
 import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 import numpy as np
-import xml.etree.ElementTree as ET
+from lxml import etree
 from datetime import datetime
-from collections import defaultdict
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Alignment
+from pathlib import Path
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 import time
 
 
@@ -57,6 +62,51 @@ END_PERIOD = ""
 
 REQUEST_TIMEOUT = 300  # seconds
 
+# Codelist labels change at most monthly: cache them on disk per month
+CODELIST_CACHE_DIR = Path(tempfile.gettempdir())
+
+# Shared HTTP session: the structure and data requests (run concurrently by
+# run_pipeline) reuse pooled keep-alive connections to the ISTAT host.
+# Connection errors and transient 429/5xx answers are retried with exponential
+# backoff (capped at 30s, plus up to 0.5s of random jitter so concurrent runs
+# do not retry in lockstep); a Retry-After header is honoured but clamped to
+# the same 30s. A status still failing after the retries is returned, not raised.
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=1, pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=1.0, backoff_jitter=0.5, backoff_max=30,
+                      retry_after_max=30, status_forcelist=[429, 500, 502, 503, 504],
+                      raise_on_status=False)))
+
+# SDMX-ML 2.1 namespaces (shared by the XPath expressions and tag constants below)
+NS_GENERIC = 'http://www.sdmx.org/resources/sdmxml/schemas/v2_1/data/generic'
+NS_STRUCTURE = 'http://www.sdmx.org/resources/sdmxml/schemas/v2_1/structure'
+NS_COMMON = 'http://www.sdmx.org/resources/sdmxml/schemas/v2_1/common'
+NS_STRUCT = {'structure': NS_STRUCTURE, 'common': NS_COMMON}
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+
+# Precompiled XPath expression for the codelist lookup
+XP_COICOP_CODES = etree.XPath(
+    "(//structure:Codelist[contains(translate(@id, 'coip', 'COIP'), 'COICOP')])[1]/structure:Code",
+    namespaces=NS_STRUCT)
+
+# Fully-qualified tags of the generic data message: Series children are
+# matched by plain string comparison, with no path or prefix resolution
+SERIES_TAG = f'{{{NS_GENERIC}}}Series'
+SERIES_KEY_TAG = f'{{{NS_GENERIC}}}SeriesKey'
+OBS_TAG = f'{{{NS_GENERIC}}}Obs'
+OBS_DIM_TAG = f'{{{NS_GENERIC}}}ObsDimension'
+OBS_VALUE_TAG = f'{{{NS_GENERIC}}}ObsValue'
+
+# Structure-specific data message: Series and Obs live in the dataflow's own
+# (or no) namespace and carry dimensions and values as plain XML attributes.
+# ANY_SERIES_TAG matches the Series of either message format.
+ANY_SERIES_TAG = '{*}Series'
+SS_OBS_TAG = '{*}Obs'
+
+# Aggregate codes sitting at the top of the ECOICOP hierarchy
+LEVEL_0_CODES = frozenset(['00', '00ST', 'OR0'])
+
 VERBOSE = True
 
 
@@ -70,9 +120,12 @@ def log(msg):
         print(f"[NIC_ECOICOP] {msg}")
 
 
+# Codes come from a fixed codelist (a few hundred entries), so the cache
+# needs no size bound or LRU bookkeeping
+@lru_cache(maxsize=None)
 def get_hierarchy_level(code: str) -> int:
     """Determine ECOICOP hierarchy level from code."""
-    if code in ['00', '00ST', 'OR0']:
+    if code in LEVEL_0_CODES:
         return 0
     stripped = code.lstrip('0')
     return len(stripped) if stripped else 1
@@ -84,37 +137,48 @@ def fetch_codelist_names() -> dict:
     preferendo l’italiano e usando l’inglese solo in assenza della traduzione italiana.
     In caso di errore restituisce un dizionario vuoto, così il resto della pipeline
     funziona usando il codice come nome.
+    Le etichette sono salvate in cache su disco per il mese corrente, così le
+    esecuzioni successive dello stesso mese saltano richiesta e parsing.
     """
+    cache_path = CODELIST_CACHE_DIR / f"codelist_{DATAFLOW_ID}_{datetime.now():%Y%m}.json"
+    try:
+        names = json.loads(cache_path.read_text(encoding='utf-8'))
+        log(f"Loaded {len(names)} code labels from cache ({cache_path.name})")
+        return names
+    except (OSError, ValueError):
+        pass  # cache assente o illeggibile: si scarica la struttura
+
     try:
-        response = requests.get(STRUCTURE_URL, timeout=REQUEST_TIMEOUT)
+        response = SESSION.get(STRUCTURE_URL, headers={"Accept-Encoding": "gzip, deflate"},
+                               timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
     except requests.RequestException:
         log("ERROR: Impossibile recuperare la struttura SDMX.")
         return {}
 
     try:
-        root = ET.fromstring(response.content)
-    except ET.ParseError:
+        root = etree.fromstring(response.content)
+    except etree.XMLSyntaxError:
         log("ERROR: XML della struttura non valido.")
         return {}
 
     names = {}
-    # trova la codelist corretta (contiene COICOP)
-    for cl in root.findall('.//{http://www.sdmx.org/resources/sdmxml/schemas/v2_1/structure}Codelist'):
-        if 'COICOP' in (cl.get('id') or '').upper():
-            for code in cl.findall('.//{http://www.sdmx.org/resources/sdmxml/schemas/v2_1/structure}Code'):
-                code_id = code.get('id')
-                label = code_id  # fallback
-                for n in code.findall('.//{http://www.sdmx.org/resources/sdmxml/schemas/v2_1/common}Name'):
-                    lang = n.get('{http://www.w3.org/XML/1998/namespace}lang')
-                    if lang == 'it':
-                        label = n.text
-                        break
-                    # usa l’inglese solo se non è già stata impostata un’etichetta
-                    elif lang == 'en' and label == code_id:
-                        label = n.text
-                names[code_id] = label
-            break
+    # Code della prima codelist COICOP, selezionati con una sola XPath precompilata
+    for code in XP_COICOP_CODES(root):
+        code_id = code.get('id')
+        # un solo passaggio sui Name (figli diretti) → {lingua: testo}
+        labels = {
+            n.get(XML_LANG): n.text
+            for n in code.iterfind('common:Name', NS_STRUCT)
+        }
+        # italiano, poi inglese, infine il codice stesso come fallback
+        names[code_id] = labels.get('it') or labels.get('en') or code_id
+
+    if names:
+        try:
+            cache_path.write_text(json.dumps(names, ensure_ascii=False), encoding='utf-8')
+        except OSError as e:
+            log(f"WARNING: Impossibile salvare la cache delle etichette: {e}")
 
     log(f"Loaded {len(names)} code labels (Italian preferred)")
     return names
@@ -124,7 +188,9 @@ def fetch_codelist_names() -> dict:
 def download_nic_data() -> tuple:
     """
     Download NIC ECOICOP data from ISTAT API in a single request.
-    Returns tuple of (data: dict, periods: list, error: str or None)
+    Returns tuple of (codes: list, periods: list, values: ndarray, error: str or None)
+    where values[i, j] is the index for codes[i] in periods[j] (NaN if missing)
+    and codes are sorted by (hierarchy level, code).
     """
     log("Downloading data from ISTAT (single request with empty string)...")
     log(f"URL: {DATA_URL}")
@@ -136,167 +202,258 @@ def download_nic_data() -> tuple:
     }
     if END_PERIOD:  # Only add endPeriod if not empty
         params["endPeriod"] = END_PERIOD
-    headers = {"Accept": "application/vnd.sdmx.genericdata+xml;version=2.1"}
-    
-    ns = {
-        'generic': 'http://www.sdmx.org/resources/sdmxml/schemas/v2_1/data/generic',
-        'message': 'http://www.sdmx.org/resources/sdmxml/schemas/v2_1/message'
+    headers = {
+        # Prefer the denser structure-specific format; generic data stays accepted
+        "Accept": ("application/vnd.sdmx.structurespecificdata+xml;version=2.1, "
+                   "application/vnd.sdmx.genericdata+xml;version=2.1;q=0.8"),
+        "Accept-Encoding": "gzip, deflate"  # XML compresses ~10x; requests decodes transparently
     }
     
     try:
         start_time = time.time()
-        response = requests.get(DATA_URL, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
-        download_time = time.time() - start_time
-        
-        log(f"Download completed: {len(response.content)/1024/1024:.2f} MB in {download_time:.1f}s")
+        # stream=True: the body is parsed while it downloads instead of being
+        # buffered whole in response.content first
+        response = SESSION.get(DATA_URL, params=params, headers=headers, timeout=REQUEST_TIMEOUT,
+                               stream=True)
         
         if response.status_code != 200:
-            return {}, [], f"HTTP {response.status_code}"
+            response.close()
+            return [], [], None, f"HTTP {response.status_code}"
             
     except requests.exceptions.Timeout:
-        return {}, [], "Request timeout"
+        return [], [], None, "Request timeout"
     except requests.exceptions.RequestException as e:
-        return {}, [], str(e)
+        return [], [], None, str(e)
+    
+    # Extract observations as flat parallel lists of raw strings (converted to
+    # float in one batch after parsing); the code is stored once per Series
+    # together with the number of observations it contributed
+    series_codes = []
+    series_counts = []
+    obs_periods = []
+    obs_values = []
+    n_series = 0
+    
+    # Parse XML incrementally with lxml straight from the socket (gzip decoded
+    # on the fly): each Series is handled as soon as it is closed, then
+    # cleared, so neither the raw body nor the full DOM is ever held in memory
+    # The format is told from the document itself, not from Content-Type:
+    # Series are matched in any namespace and dispatched on their exact tag
+    # (generic Series are in the generic namespace, structure-specific ones
+    # in the dataflow's own or none)
+    structure_specific = False
+    with response:
+        response.raw.decode_content = True
+        context = etree.iterparse(response.raw, events=('end',), tag=ANY_SERIES_TAG)
+        try:
+            for _, series in context:
+                n_series += 1
+                series_code = None
+                n_before = len(obs_values)
+                structure_specific = series.tag != SERIES_TAG
+                
+                if structure_specific:
+                    # One element per observation, everything in its attributes
+                    series_code = series.get('E_COICOP_REV_ISTAT')
+                    for obs in series.iterchildren(SS_OBS_TAG):
+                        obs_period = obs.get('TIME_PERIOD')
+                        obs_value = obs.get('OBS_VALUE')
+                        
+                        if obs_period is not None and obs_value is not None:
+                            obs_periods.append(obs_period)
+                            obs_values.append(obs_value)
+                else:
+                    # SeriesKey, Attributes and Obs are all direct children:
+                    # a single pass over them, dispatched on the tag
+                    for child in series:
+                        tag = child.tag
+                        if tag == OBS_TAG:
+                            obs_period = obs_value = None
+                            for item in child:
+                                item_tag = item.tag
+                                if item_tag == OBS_DIM_TAG:
+                                    obs_period = item.get('value')
+                                elif item_tag == OBS_VALUE_TAG:
+                                    obs_value = item.get('value')
+                            
+                            if obs_period is not None and obs_value is not None:
+                                obs_periods.append(obs_period)
+                                obs_values.append(obs_value)
+                        elif tag == SERIES_KEY_TAG:
+                            for key_value in child:
+                                if key_value.get('id') == 'E_COICOP_REV_ISTAT':
+                                    series_code = key_value.get('value')
+                                    break
+                
+                if series_code is None:
+                    # Not an ECOICOP series: discard whatever it contributed
+                    del obs_periods[n_before:], obs_values[n_before:]
+                elif len(obs_values) > n_before:
+                    series_codes.append(series_code)
+                    series_counts.append(len(obs_values) - n_before)
+                
+                # Free the processed Series and the already-cleared siblings before it
+                series.clear()
+                while series.getprevious() is not None:
+                    del series.getparent()[0]
+        except etree.XMLSyntaxError as e:
+            return [], [], None, f"XML parse error: {e}"
+        except urllib3.exceptions.HTTPError as e:
+            return [], [], None, f"Download interrupted: {e}"
+        
+        encoding = response.headers.get('Content-Encoding', 'identity')
+        content_type = response.headers.get('Content-Type', 'unknown')
+        data_format = 'structure-specific' if structure_specific else 'generic'
+        log(f"Download and parse completed: {response.raw.tell()/1024/1024:.2f} MB received "
+            f"in {time.time() - start_time:.1f}s ({data_format} data, Content-Type: {content_type}, "
+            f"Content-Encoding: {encoding})")
+    
+    if n_series == 0:
+        return [], [], None, "No Series found in response"
+    log(f"Found {n_series} series")
+    
+    # Row index of every observation in one hashed C pass
+    series_idx, codes = pd.factorize(np.asarray(series_codes, dtype=object))
+    code_idx = np.repeat(series_idx, series_counts)
     
-    # Parse XML
+    # Convert all values at once in C; only if some value is not a number
+    # (e.g. '' or '..') fall back to coercing, and drop those observations
+    # together with any product left without data
+    obs_periods = np.asarray(obs_periods, dtype=object)
     try:
-        root = ET.fromstring(response.content)
-    except ET.ParseError as e:
-        return {}, [], f"XML parse error: {e}"
+        obs_values = np.array(obs_values, dtype=np.float64)
+    except ValueError:
+        raw_values = np.asarray(obs_values, dtype=object)
+        obs_values = pd.to_numeric(raw_values, errors='coerce')
+        # Coercion also yields NaN for a literal 'NaN', which is a valid value:
+        # only the few distinct strings float() rejects are dropped
+        invalid = set()
+        for raw in set(raw_values[np.isnan(obs_values)]):
+            try:
+                float(raw)
+            except ValueError:
+                invalid.add(raw)
+        valid = ~pd.Series(raw_values).isin(invalid).to_numpy()
+        obs_periods, obs_values = obs_periods[valid], obs_values[valid]
+        used, code_idx = np.unique(code_idx[valid], return_inverse=True)
+        codes = codes[used]
+        if len(codes) == 0:
+            return [], [], None, "No numeric observations found in response"
     
-    dataset = root.find('.//message:DataSet', ns)
-    if dataset is None:
-        return {}, [], "No DataSet found in response"
+    # sort=True returns the distinct periods already in chronological order
+    period_idx, raw_periods = pd.factorize(obs_periods, sort=True)
     
-    series_list = dataset.findall('.//generic:Series', ns)
-    log(f"Found {len(series_list)} series")
+    # Normalise each distinct period once ('2024-01' → '2024M01') rather than
+    # once per observation: ~120 labels against tens of thousands of obs
+    periods = [raw.replace('-', 'M') for raw in raw_periods]
     
-    # Extract data
-    data = defaultdict(dict)
-    periods = set()
+    # Rows in (level, code) order from the start: remap each observation's row
+    # through the rank of its code, so the matrix is filled already sorted
+    order = sorted(range(len(codes)), key=lambda i: (get_hierarchy_level(codes[i]), codes[i]))
+    rank = np.empty(len(order), dtype=np.intp)
+    rank[order] = np.arange(len(order))
     
-    for series in series_list:
-        series_key = series.find('.//generic:SeriesKey', ns)
-        if series_key is None:
-            continue
-        
-        ecoicop_code = None
-        for v in series_key.findall('.//generic:Value', ns):
-            if v.get('id') == 'E_COICOP_REV_ISTAT':
-                ecoicop_code = v.get('value')
-                break
-        
-        if ecoicop_code is None:
-            continue
-        
-        for obs in series.findall('.//generic:Obs', ns):
-            obs_dim = obs.find('.//generic:ObsDimension', ns)
-            obs_value = obs.find('.//generic:ObsValue', ns)
-            
-            if obs_dim is not None and obs_value is not None:
-                period = obs_dim.get('value', '').replace('-', 'M')
-                try:
-                    data[ecoicop_code][period] = float(obs_value.get('value'))
-                    periods.add(period)
-                except (ValueError, TypeError):
-                    pass
+    values = np.full((len(codes), len(periods)), np.nan)
+    values[rank[code_idx], period_idx] = obs_values
     
-    log(f"Extracted {len(data)} products, {len(periods)} periods")
-    return dict(data), sorted(periods), None
+    log(f"Extracted {len(codes)} products, {len(periods)} periods")
+    return [codes[i] for i in order], periods, values, None
 
 
-def create_excel_file(data: dict, periods: list, code_names: dict, error: str = None) -> io.BytesIO:
+def create_excel_file(codes: list, periods: list, values: np.ndarray, code_names: dict,
+                      error: str = None, output_format: str = 'xlsx') -> io.BytesIO | tuple:
     """
     Create Excel file with data and metadata sheets.
+    With output_format='csv' the data table and the metadata are written as two
+    UTF-8 CSV files instead, returned as a (data, metadata) tuple of buffers;
+    the metadata sidecar also records the output format.
     """
-    log("Creating Excel file...")
+    if output_format not in ('xlsx', 'csv'):
+        raise ValueError(f"Unsupported output format: {output_format}")
+    log(f"Creating {'Excel' if output_format == 'xlsx' else 'CSV'} file...")
     
-    # Create DataFrame
-    rows = []
-    for code in sorted(data.keys(), key=lambda x: (get_hierarchy_level(x), x)):
-        row = {
-            'CODE': code,
-            'NAME': code_names.get(code, code),
-            'LEVEL': get_hierarchy_level(code)
-        }
-        for period in periods:
-            row[period] = data[code].get(period)
-        rows.append(row)
+    names = [code_names.get(code, code) for code in codes]
+    levels = [get_hierarchy_level(code) for code in codes]
+    
+    # Metadata: a fixed list of (field, value) rows written directly, no
+    # DataFrame needed for a two-column table of known shape
+    now = datetime.now()
+    metadata = [
+        ('edition', ''),
+        ('edition_type', 'DateDownload'),
+        ('download_date', now.strftime('%Y-%m-%d %H:%M:%S')),
+        ('source_path', SOURCE_PATH),
+        ('source_path_it', SOURCE_PATH_IT),
+        ('dataflow_id', DATAFLOW_ID),
+        ('dataflow_url', STRUCTURE_URL.split('?')[0]),
+        ('measure', 'Index numbers'),
+        ('measure_code', '4'),
+        ('frequency', 'Monthly'),
+        ('frequency_code', 'M'),
+        ('base_year', '2015'),
+        ('territory', 'IT (Italy)'),
+        ('start_period', periods[0] if periods else ''),
+        ('end_period', periods[-1] if periods else ''),
+        ('n_products', len(codes)),
+        ('n_periods', len(periods)),
+        ('errors', error if error else 'None')
+    ]
     
-    df = pd.DataFrame(rows)
-    log(f"DataFrame created: {len(df)} rows x {len(df.columns)} columns")
+    if output_format == 'csv':
+        # Create DataFrame straight from the dense matrix (rows already sorted)
+        df = pd.DataFrame(values, columns=periods)
+        df.insert(0, 'LEVEL', levels)
+        df.insert(0, 'NAME', names)
+        df.insert(0, 'CODE', codes)
+        log(f"DataFrame created: {len(df)} rows x {len(df.columns)} columns")
+        
+        # Plain text rows, no zip container or sheet XML to build; the
+        # metadata goes to a small Field,Value sidecar
+        buffer = io.BytesIO()
+        df.to_csv(buffer, index=False, encoding='utf-8')
+        buffer.seek(0)
+        meta_buffer = io.BytesIO()
+        pd.DataFrame(metadata + [('output_format', 'csv')], columns=['Field', 'Value']).to_csv(
+            meta_buffer, index=False, encoding='utf-8')
+        meta_buffer.seek(0)
+        log("CSV files created successfully (data + metadata)")
+        return buffer, meta_buffer
     
-    # Create Excel
+    # Create Excel (xlsxwriter streams the sheet XML, no per-cell objects like
+    # openpyxl; URLs in the metadata stay plain strings as before)
     buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-        # Data sheet
-        df.to_excel(writer, sheet_name='Data', index=False)
-        
-        # Format data sheet
-        ws = writer.sheets['Data']
-        for col_idx, col in enumerate(df.columns, 1):
-            col_letter = get_column_letter(col_idx)
-            if col in ['CODE', 'NAME']:
-                ws.column_dimensions[col_letter].width = 50 if col == 'NAME' else 12
-            elif col == 'LEVEL':
-                ws.column_dimensions[col_letter].width = 8
-            else:
-                ws.column_dimensions[col_letter].width = 10
+    with pd.ExcelWriter(buffer, engine='xlsxwriter',
+                        engine_kwargs={'options': {'strings_to_urls': False}}) as writer:
+        # Data sheet: written column by column straight from the (already
+        # sorted) matrix, skipping pandas' per-cell formatting; missing values
+        # become None, which xlsxwriter leaves as empty cells like to_excel
+        ws = writer.book.add_worksheet('Data')
+        ws.write_row(0, 0, ['CODE', 'NAME', 'LEVEL'] + list(periods))
+        ws.write_column(1, 0, codes)
+        ws.write_column(1, 1, names)
+        ws.write_column(1, 2, levels)
+        cells = np.where(np.isnan(values), None, values)
+        for col_idx in range(len(periods)):
+            ws.write_column(1, 3 + col_idx, cells[:, col_idx].tolist())
+        log(f"Data sheet written: {len(codes)} rows x {3 + len(periods)} columns")
         
-        # Metadata sheet
-        now = datetime.now()
-        metadata = {
-            'Field': [
-                'edition',
-                'edition_type',
-                'download_date',
-                'source_path',
-                'source_path_it',
-                'dataflow_id',
-                'dataflow_url',
-                'measure',
-                'measure_code',
-                'frequency',
-                'frequency_code',
-                'base_year',
-                'territory',
-                'start_period',
-                'end_period',
-                'n_products',
-                'n_periods',
-                'errors'
-            ],
-            'Value': [
-                '',
-                'DateDownload',
-                now.strftime('%Y-%m-%d %H:%M:%S'),
-                SOURCE_PATH,
-                SOURCE_PATH_IT,
-                DATAFLOW_ID,
-                STRUCTURE_URL.split('?')[0],
-                'Index numbers',
-                '4',
-                'Monthly',
-                'M',
-                '2015',
-                'IT (Italy)',
-                periods[0] if periods else '',
-                periods[-1] if periods else '',
-                len(df),
-                len(periods),
-                error if error else 'None'
-            ]
-        }
-        meta_df = pd.DataFrame(metadata)
-        meta_df.to_excel(writer, sheet_name='Metadata', index=False)
+        # Format data sheet: CODE, NAME, LEVEL, then one range call for all
+        # period columns whatever their number
+        ws.set_column(0, 0, 12)
+        ws.set_column(1, 1, 50)
+        ws.set_column(2, 2, 8)
+        if periods:
+            ws.set_column(3, 2 + len(periods), 10)
         
-        # Format metadata sheet
-        ws_meta = writer.sheets['Metadata']
-        ws_meta.column_dimensions['A'].width = 20
-        ws_meta.column_dimensions['B'].width = 80
-        for row in ws_meta.iter_rows(min_row=2, max_col=2):
-            for cell in row:
-                cell.alignment = Alignment(wrap_text=True)
+        # Metadata sheet: only the value rows wrap, the header row is written
+        # without a format (a column format would apply to it as well)
+        ws_meta = writer.book.add_worksheet('Metadata')
+        wrap_format = writer.book.add_format({'text_wrap': True})
+        ws_meta.set_column(0, 0, 20)
+        ws_meta.set_column(1, 1, 80)
+        ws_meta.write_row(0, 0, ['Field', 'Value'])
+        for row_idx, row in enumerate(metadata, 1):
+            ws_meta.write_row(row_idx, 0, row, wrap_format)
     
     buffer.seek(0)
     log("Excel file created successfully")
@@ -324,31 +481,35 @@ def run_pipeline() -> dict:
     }
     
     try:
-        # 1. Fetch code labels
-        code_names = fetch_codelist_names()
+        # 1-2. Fetch code labels and download data (single request) concurrently:
+        # the two calls are independent, so the structure request hides behind
+        # the much larger data download
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            names_future = executor.submit(fetch_codelist_names)
+            data_future = executor.submit(download_nic_data)
+            code_names = names_future.result()
+            codes, periods, values, error = data_future.result()
+        
         if not code_names:
             log("WARNING: Could not fetch code labels, using codes as names")
         
-        # 2. Download data (single request)
-        data, periods, error = download_nic_data()
-        
-        if not data:
+        if not codes:
             result['message'] = f'Download failed: {error}'
             log(f"ERROR: {result['message']}")
             return result
         
         # 3. Create Excel file
-        buffer = create_excel_file(data, periods, code_names, error)
+        buffer = create_excel_file(codes, periods, values, code_names, error)
         
         # 4. Prepare result
         elapsed = time.time() - start_time
         
         result['status'] = 'success'
-        result['message'] = f'Downloaded {len(data)} products, {len(periods)} periods in {elapsed:.1f}s'
+        result['message'] = f'Downloaded {len(codes)} products, {len(periods)} periods in {elapsed:.1f}s'
         result['buffer'] = buffer
         result['folder_id'] = OUTPUT_FOLDER_ID
         result['metadata'] = {
-            'n_products': len(data),
+            'n_products': len(codes),
             'n_periods': len(periods),
             'period_range': f"{periods[0]} → {periods[-1]}" if periods else '',
             'elapsed_seconds': round(elapsed, 1)
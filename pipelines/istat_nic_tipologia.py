@@ -19,16 +19,33 @@ instead of all 132 territories, reducing download from 24 MB to ~1.6 MB.
 """
 
 import io
+import os
+import json
+import hashlib
+import tempfile
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import pandas as pd
 import numpy as np
-import xml.etree.ElementTree as ET
+from lxml import etree
 from datetime import datetime
-from collections import defaultdict
-from openpyxl.utils import get_column_letter
+from pathlib import Path
+from contextlib import ExitStack, suppress
+from concurrent.futures import ThreadPoolExecutor
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Alignment
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.dimensions import ColumnDimension
 import time
 
+try:
+    import xlsxwriter  # noqa: F401 - engine behind pd.ExcelWriter below
+    HAS_XLSXWRITER = True
+except ImportError:
+    HAS_XLSXWRITER = False
+
 
 # =============================================================================
 # CONFIGURATION
@@ -68,6 +85,57 @@ START_PERIOD = "2016-01-01"
 END_PERIOD = ""
 
 REQUEST_TIMEOUT = 300  # seconds
+DOWNLOAD_CHUNK_SIZE = 64 * 1024  # bytes fed to the XML parser at a time
+
+# Structure and data responses are cached on disk together with their
+# ETag/Last-Modified: later runs send a conditional GET and, on 304 Not
+# Modified, reparse the cached copy instead of downloading it again
+HTTP_CACHE_DIR = Path(tempfile.gettempdir())
+
+# Data sheet layout: the label columns with their widths, then one column per
+# period, all sharing the same width
+LABEL_COLUMN_WIDTHS = {
+    'TERRITORY': 15,
+    'TERRITORY_NAME': 50,
+    'PRODUCT_TYPE': 15,
+    'PRODUCT_NAME': 50
+}
+PERIOD_COLUMN_WIDTH = 10
+
+# Shared HTTP session: the structure and data requests (run concurrently by
+# run_pipeline) reuse pooled keep-alive connections to the ISTAT host.
+# Connection errors and transient 429/5xx answers are retried with exponential
+# backoff (capped at 30s, plus up to 0.5s of random jitter so concurrent runs
+# do not retry in lockstep); a Retry-After header is honoured but clamped to
+# the same 30s. A status still failing after the retries is returned, not raised.
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=1, pool_maxsize=4,
+    max_retries=Retry(total=3, backoff_factor=1.0, backoff_jitter=0.5, backoff_max=30,
+                      retry_after_max=30, status_forcelist=[429, 500, 502, 503, 504],
+                      raise_on_status=False)))
+
+# SDMX-ML 2.1 namespaces (shared by the XPath expressions and tag constants below)
+NS_GENERIC = 'http://www.sdmx.org/resources/sdmxml/schemas/v2_1/data/generic'
+NS_STRUCTURE = 'http://www.sdmx.org/resources/sdmxml/schemas/v2_1/structure'
+NS_COMMON = 'http://www.sdmx.org/resources/sdmxml/schemas/v2_1/common'
+NS_STRUCT = {'structure': NS_STRUCTURE, 'common': NS_COMMON}
+XML_LANG = '{http://www.w3.org/XML/1998/namespace}lang'
+
+# Precompiled XPath expression for the codelist lookup; the Name children of
+# each Code are then matched by their fully-qualified tag
+XP_COICOP_CODES = etree.XPath(
+    "(//structure:Codelist[contains(translate(@id, 'coip', 'COIP'), 'COICOP')])[1]/structure:Code",
+    namespaces=NS_STRUCT)
+NAME_TAG = f'{{{NS_COMMON}}}Name'
+
+# Fully-qualified tags of the generic data message: Series children are
+# matched by plain string comparison, with no path or prefix resolution
+SERIES_TAG = f'{{{NS_GENERIC}}}Series'
+SERIES_KEY_TAG = f'{{{NS_GENERIC}}}SeriesKey'
+OBS_TAG = f'{{{NS_GENERIC}}}Obs'
+OBS_DIM_TAG = f'{{{NS_GENERIC}}}ObsDimension'
+OBS_VALUE_TAG = f'{{{NS_GENERIC}}}ObsValue'
 
 VERBOSE = True
 
@@ -82,6 +150,80 @@ def log(msg):
         print(f"[NIC_Tipologia] {msg}")
 
 
+def http_cache_paths(url: str, params: dict = None) -> tuple:
+    """Cached body and validator sidecar paths for a request, keyed by URL + params."""
+    key = hashlib.sha256(f"{url}?{sorted((params or {}).items())}".encode()).hexdigest()[:16]
+    base = HTTP_CACHE_DIR / f"nic_tipologia_{key}"
+    return base.with_suffix('.xml'), base.with_suffix('.json')
+
+
+def cache_part_file(body_path: Path):
+    """
+    New, uniquely named temp file next to a cached body: it is filled first and
+    then moved over the body with os.replace, so concurrent runs never write
+    the same file and readers never see a partial copy.
+    """
+    return tempfile.NamedTemporaryFile(dir=body_path.parent, prefix=f"{body_path.stem}_",
+                                       suffix='.part', delete=False)
+
+
+def conditional_headers(body_path: Path, meta_path: Path) -> dict:
+    """If-None-Match / If-Modified-Since headers for a cached response (empty if none)."""
+    if not body_path.exists():
+        return {}
+    try:
+        meta = json.loads(meta_path.read_text(encoding='utf-8'))
+    except (OSError, ValueError):
+        return {}
+    headers = {}
+    if meta.get('etag'):
+        headers['If-None-Match'] = meta['etag']
+    if meta.get('last_modified'):
+        headers['If-Modified-Since'] = meta['last_modified']
+    return headers
+
+
+def response_validators(response: requests.Response) -> dict:
+    """ETag / Last-Modified of a response (empty if the server sends neither)."""
+    validators = {
+        'etag': response.headers.get('ETag'),
+        'last_modified': response.headers.get('Last-Modified')
+    }
+    return {k: v for k, v in validators.items() if v}
+
+
+def copy_chunks(chunks, file):
+    """
+    Yield the chunks unchanged, writing each one to file on the way.
+    If a write fails (e.g. disk full) the file is closed and the remaining
+    chunks are only yielded: a closed file afterwards marks an incomplete copy.
+    """
+    for chunk in chunks:
+        if not file.closed:
+            try:
+                file.write(chunk)
+            except OSError as e:
+                log(f"WARNING: Could not cache the data response: {e}")
+                with suppress(OSError):
+                    file.close()
+        yield chunk
+
+
+def iter_series(chunks):
+    """
+    Feed XML chunks to an incremental lxml parser and yield each generic
+    Series element as soon as its closing tag has been parsed.
+    """
+    parser = etree.XMLPullParser(events=('end',), tag=SERIES_TAG)
+    for chunk in chunks:
+        parser.feed(chunk)
+        for _, series in parser.read_events():
+            yield series
+    parser.close()  # raises XMLSyntaxError on a truncated document
+    for _, series in parser.read_events():
+        yield series
+
+
 def fetch_codelist_names() -> dict:
     """
     Recupera i nomi dei codici (ECOICOP o tipologia) dalla struttura SDMX,
@@ -89,36 +231,66 @@ def fetch_codelist_names() -> dict:
     In caso di errore restituisce un dizionario vuoto, così il resto della pipeline
     funziona usando il codice come nome.
     """
+    body_path, meta_path = http_cache_paths(STRUCTURE_URL)
+    headers = {"Accept-Encoding": "gzip, deflate"}
+    content = None
     try:
-        response = requests.get(STRUCTURE_URL, timeout=REQUEST_TIMEOUT)
+        response = SESSION.get(STRUCTURE_URL, timeout=REQUEST_TIMEOUT,
+                               headers={**headers, **conditional_headers(body_path, meta_path)})
+        if response.status_code == 304:
+            # struttura non modificata: si rilegge la copia salvata; se nel
+            # frattempo è sparita, la si richiede senza intestazioni condizionali
+            try:
+                content = body_path.read_bytes()
+            except OSError as e:
+                log(f"WARNING: Copia in cache della struttura non leggibile ({e}), nuovo download")
+                response = SESSION.get(STRUCTURE_URL, headers=headers, timeout=REQUEST_TIMEOUT)
         response.raise_for_status()
     except requests.RequestException:
         log("ERROR: Impossibile recuperare la struttura SDMX.")
         return {}
 
+    if content is not None:
+        log("Struttura SDMX non modificata, uso la copia in cache")
+    else:
+        content = response.content
+        validators = response_validators(response)
+        if validators:
+            part = None
+            try:
+                with cache_part_file(body_path) as part:
+                    part.write(content)
+                os.replace(part.name, body_path)
+                meta_path.write_text(json.dumps(validators), encoding='utf-8')
+            except OSError as e:
+                log(f"WARNING: Impossibile salvare la struttura in cache: {e}")
+                # la copia parziale non deve restare nella cartella temporanea
+                if part is not None:
+                    Path(part.name).unlink(missing_ok=True)
+
     try:
-        root = ET.fromstring(response.content)
-    except ET.ParseError:
+        root = etree.fromstring(content)
+    except etree.XMLSyntaxError:
         log("ERROR: XML della struttura non valido.")
         return {}
 
+    # Code della prima codelist COICOP, selezionati con una sola XPath precompilata
     names = {}
-    # trova la codelist corretta (contiene COICOP)
-    for cl in root.findall('.//{http://www.sdmx.org/resources/sdmxml/schemas/v2_1/structure}Codelist'):
-        if 'COICOP' in (cl.get('id') or '').upper():
-            for code in cl.findall('.//{http://www.sdmx.org/resources/sdmxml/schemas/v2_1/structure}Code'):
-                code_id = code.get('id')
-                label = code_id  # fallback
-                for n in code.findall('.//{http://www.sdmx.org/resources/sdmxml/schemas/v2_1/common}Name'):
-                    lang = n.get('{http://www.w3.org/XML/1998/namespace}lang')
-                    if lang == 'it':
-                        label = n.text
-                        break
-                    # usa l’inglese solo se non è già stata impostata un’etichetta
-                    elif lang == 'en' and label == code_id:
-                        label = n.text
-                names[code_id] = label
-            break
+    for code in XP_COICOP_CODES(root):
+        code_id = code.get('id')
+        # un solo passaggio sui figli diretti: ci si ferma al primo Name
+        # italiano, l'inglese resta come riserva, infine il codice stesso
+        label = None
+        for child in code:
+            if child.tag != NAME_TAG or not child.text:
+                continue
+            lang = child.get(XML_LANG)
+            if lang == 'it':
+                label = child.text
+                break
+            if lang == 'en' and label is None:
+                label = child.text
+        names[code_id] = label if label is not None else code_id
 
     log(f"Loaded {len(names)} code labels (Italian preferred)")
     return names
@@ -127,7 +299,9 @@ def fetch_codelist_names() -> dict:
 def download_nic_data() -> tuple:
     """
     Download NIC Tipologia data from ISTAT API in a single request.
-    Returns tuple of (data: dict, periods: list, error: str or None)
+    Returns tuple of (keys: list, periods: list, values: ndarray, error: str or None)
+    where keys are the sorted (territory, product) combinations and values[i, j]
+    is the index for keys[i] in periods[j] (NaN if missing).
     """
     log("Downloading data from ISTAT (single request)...")
     log(f"URL: {DATA_URL}")
@@ -140,183 +314,316 @@ def download_nic_data() -> tuple:
     }
     if END_PERIOD:  # Only add endPeriod if not empty
         params["endPeriod"] = END_PERIOD
-    headers = {"Accept": "application/vnd.sdmx.genericdata+xml;version=2.1"}
-    
-    ns = {
-        'generic': 'http://www.sdmx.org/resources/sdmxml/schemas/v2_1/data/generic',
-        'message': 'http://www.sdmx.org/resources/sdmxml/schemas/v2_1/message'
+    headers = {
+        "Accept": "application/vnd.sdmx.genericdata+xml;version=2.1",
+        "Accept-Encoding": "gzip, deflate"  # XML compresses ~10x; requests decodes transparently
     }
+    body_path, meta_path = http_cache_paths(DATA_URL, params)
+    cached = None
     
     try:
         start_time = time.time()
-        response = requests.get(DATA_URL, params=params, headers=headers, timeout=REQUEST_TIMEOUT)
-        download_time = time.time() - start_time
+        # stream=True: the body is parsed while it downloads instead of being
+        # buffered whole in response.content first
+        response = SESSION.get(DATA_URL, params=params, timeout=REQUEST_TIMEOUT, stream=True,
+                               headers={**headers, **conditional_headers(body_path, meta_path)})
         
-        log(f"Download completed: {len(response.content)/1024/1024:.2f} MB in {download_time:.1f}s")
+        if response.status_code == 304:
+            try:
+                cached = open(body_path, 'rb')
+            except OSError as e:
+                # e.g. removed by a temp-dir cleaner after the conditional GET:
+                # the data is still on the server, so fetch it unconditionally
+                log(f"WARNING: Cached data unreadable ({e}), downloading it again")
+                response.close()
+                response = SESSION.get(DATA_URL, params=params, headers=headers,
+                                       timeout=REQUEST_TIMEOUT, stream=True)
         
-        if response.status_code != 200:
-            return {}, [], f"HTTP {response.status_code}"
+        if response.status_code not in (200, 304):
+            response.close()
+            return [], [], None, f"HTTP {response.status_code}"
             
     except requests.exceptions.Timeout:
-        return {}, [], "Request timeout"
+        return [], [], None, "Request timeout"
     except requests.exceptions.RequestException as e:
-        return {}, [], str(e)
+        return [], [], None, str(e)
+    
+    # Extract observations as flat parallel lists of raw strings (converted to
+    # float in one batch after parsing); the key is stored once per Series
+    # together with the number of observations it contributed
+    series_territories = []
+    series_products = []
+    series_counts = []
+    obs_periods = []
+    obs_values = []
+    n_series = 0
+    
+    # Parse XML incrementally with lxml as the chunks arrive (gzip decoded on
+    # the fly): each Series is handled as soon as it is closed, then cleared,
+    # so neither the raw body nor the full DOM is ever held in memory.
+    # On 304 the chunks come from the cached copy instead; a fresh body with
+    # validators is copied to the cache while it is parsed.
+    validators = response_validators(response) if response.status_code == 200 else {}
+    with response, ExitStack() as stack:
+        if response.status_code == 304:
+            log("Data not modified since the cached download, parsing the cached copy")
+            stack.enter_context(cached)
+            chunks = iter(lambda: cached.read(DOWNLOAD_CHUNK_SIZE), b'')
+        else:
+            chunks = response.iter_content(DOWNLOAD_CHUNK_SIZE)
+            if validators:
+                try:
+                    part = cache_part_file(body_path)
+                except OSError as e:
+                    log(f"WARNING: Could not cache the data response: {e}")
+                    validators = {}
+                else:
+                    # Deleted on exit unless it has been moved into place below
+                    stack.callback(Path(part.name).unlink, missing_ok=True)
+                    chunks = copy_chunks(chunks, stack.enter_context(part))
+        try:
+            for series in iter_series(chunks):
+                n_series += 1
+                territory = None
+                product = None
+                n_before = len(obs_values)
+                
+                # SeriesKey, Attributes and Obs are all direct children:
+                # a single pass over them, dispatched on the tag
+                for child in series:
+                    tag = child.tag
+                    if tag == OBS_TAG:
+                        obs_period = obs_value = None
+                        for item in child:
+                            item_tag = item.tag
+                            if item_tag == OBS_DIM_TAG:
+                                obs_period = item.get('value', '')
+                            elif item_tag == OBS_VALUE_TAG:
+                                obs_value = item.get('value')
+                        
+                        if obs_period is not None and obs_value is not None:
+                            obs_periods.append(obs_period)
+                            obs_values.append(obs_value)
+                    elif tag == SERIES_KEY_TAG:
+                        for key_value in child:
+                            vid = key_value.get('id')
+                            if vid == 'REF_AREA':
+                                territory = key_value.get('value')
+                            elif vid == 'E_COICOP_REV_ISTAT':
+                                product = key_value.get('value')
+                
+                if territory is None or product is None:
+                    # Incomplete key: discard whatever the Series contributed
+                    del obs_periods[n_before:], obs_values[n_before:]
+                elif len(obs_values) > n_before:
+                    series_territories.append(territory)
+                    series_products.append(product)
+                    series_counts.append(len(obs_values) - n_before)
+                
+                # Free the processed Series and the already-cleared siblings before it
+                series.clear()
+                while series.getprevious() is not None:
+                    del series.getparent()[0]
+        except etree.XMLSyntaxError as e:
+            return [], [], None, f"XML parse error: {e}"
+        except requests.exceptions.RequestException as e:
+            return [], [], None, f"Download interrupted: {e}"
+        
+        encoding = response.headers.get('Content-Encoding', 'identity')
+        log(f"Download and parse completed: {response.raw.tell()/1024/1024:.2f} MB received "
+            f"in {time.time() - start_time:.1f}s (Content-Encoding: {encoding})")
+        
+        # The copy is complete and well-formed: it becomes the cached response
+        # (unless copy_chunks gave up on it and closed it early)
+        if validators and not part.closed:
+            try:
+                part.close()
+                os.replace(part.name, body_path)
+                meta_path.write_text(json.dumps(validators), encoding='utf-8')
+            except OSError as e:
+                log(f"WARNING: Could not cache the data response: {e}")
+    
+    if n_series == 0:
+        return [], [], None, "No Series found in response"
+    log(f"Found {n_series} series")
     
-    # Parse XML
+    # Row index of every observation: factorize territories and products
+    # (sorted), so their combined integer id orders rows by (territory, product)
+    territory_idx, territories = pd.factorize(np.asarray(series_territories, dtype=object), sort=True)
+    product_idx, products = pd.factorize(np.asarray(series_products, dtype=object), sort=True)
+    combos, series_row = np.unique(territory_idx * len(products) + product_idx, return_inverse=True)
+    row_idx = np.repeat(series_row, series_counts)
+    
+    # Convert all values at once in C; only if some value is not a number
+    # (e.g. '' or '..') fall back to coercing, and drop those observations
+    # together with any combination left without data
+    obs_periods = np.asarray(obs_periods, dtype=object)
     try:
-        root = ET.fromstring(response.content)
-    except ET.ParseError as e:
-        return {}, [], f"XML parse error: {e}"
+        obs_values = np.array(obs_values, dtype=np.float64)
+    except ValueError:
+        raw_values = np.asarray(obs_values, dtype=object)
+        obs_values = pd.to_numeric(raw_values, errors='coerce')
+        # Coercion also yields NaN for a literal 'NaN', which is a valid value:
+        # only the few distinct strings float() rejects are dropped
+        invalid = set()
+        for raw in set(raw_values[np.isnan(obs_values)]):
+            try:
+                float(raw)
+            except ValueError:
+                invalid.add(raw)
+        valid = ~pd.Series(raw_values).isin(invalid).to_numpy()
+        obs_periods, obs_values = obs_periods[valid], obs_values[valid]
+        used, row_idx = np.unique(row_idx[valid], return_inverse=True)
+        combos = combos[used]
     
-    dataset = root.find('.//message:DataSet', ns)
-    if dataset is None:
-        return {}, [], "No DataSet found in response"
+    # sort=True returns the distinct periods already in chronological order;
+    # each distinct period is normalised once ('2024-01' → '2024M01')
+    period_idx, raw_periods = pd.factorize(obs_periods, sort=True)
+    periods = [raw.replace('-', 'M') for raw in raw_periods]
     
-    series_list = dataset.findall('.//generic:Series', ns)
-    log(f"Found {len(series_list)} series")
+    values = np.full((len(combos), len(periods)), np.nan)
+    values[row_idx, period_idx] = obs_values
+    keys = list(zip(territories[combos // len(products)], products[combos % len(products)]))
     
-    # Extract data: {(territory, product): {period: value}}
-    data = defaultdict(dict)
-    periods = set()
-    territories_found = set()
-    products_found = set()
+    log(f"Extracted {len(territories)} territories, {len(products)} products, {len(keys)} combinations")
+    return keys, periods, values, None
+
+
+def write_excel_openpyxl(label_columns: dict, periods: list, values: np.ndarray,
+                         metadata: list) -> io.BytesIO:
+    """
+    Fallback writer used when xlsxwriter is not installed: openpyxl in
+    write-only mode streams each row to the sheet XML instead of keeping a
+    Cell object per value until save. Same sheets, widths and wrapping.
+    """
+    wb = Workbook(write_only=True)
     
-    for series in series_list:
-        series_key = series.find('.//generic:SeriesKey', ns)
-        if series_key is None:
-            continue
-        
-        territory = None
-        product = None
-        for v in series_key.findall('.//generic:Value', ns):
-            vid = v.get('id')
-            if vid == 'REF_AREA':
-                territory = v.get('value')
-                territories_found.add(territory)
-            elif vid == 'E_COICOP_REV_ISTAT':
-                product = v.get('value')
-                products_found.add(product)
-        
-        if territory is None or product is None:
-            continue
-        
-        for obs in series.findall('.//generic:Obs', ns):
-            obs_dim = obs.find('.//generic:ObsDimension', ns)
-            obs_value = obs.find('.//generic:ObsValue', ns)
-            
-            if obs_dim is not None and obs_value is not None:
-                period = obs_dim.get('value', '').replace('-', 'M')
-                try:
-                    data[(territory, product)][period] = float(obs_value.get('value'))
-                    periods.add(period)
-                except (ValueError, TypeError):
-                    pass
+    # Data sheet (column widths must be set before the first row is appended)
+    # (label columns one by one, then a single <col> range for all periods)
+    ws = wb.create_sheet('Data')
+    for col_idx, width in enumerate(LABEL_COLUMN_WIDTHS.values(), 1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = width
+    if periods:
+        first_period_col = len(LABEL_COLUMN_WIDTHS) + 1
+        first_letter = get_column_letter(first_period_col)
+        ws.column_dimensions[first_letter] = ColumnDimension(
+            ws, index=first_letter, min=first_period_col, max=len(LABEL_COLUMN_WIDTHS) + len(periods),
+            width=PERIOD_COLUMN_WIDTH)
+    ws.append(list(label_columns) + list(periods))
+    # Missing values must be None (an empty cell), openpyxl would write NaN as text
+    cells = np.where(np.isnan(values), None, values).tolist()
+    for labels, row in zip(zip(*label_columns.values()), cells):
+        ws.append(list(labels) + row)
+    
+    # Metadata sheet
+    ws_meta = wb.create_sheet('Metadata')
+    ws_meta.column_dimensions['A'].width = 20
+    ws_meta.column_dimensions['B'].width = 100
+    ws_meta.append(['Field', 'Value'])
+    wrap = Alignment(wrap_text=True)
+    for row in metadata:
+        cells = []
+        for value in row:
+            cell = WriteOnlyCell(ws_meta, value=value)
+            cell.alignment = wrap
+            cells.append(cell)
+        ws_meta.append(cells)
     
-    log(f"Extracted {len(territories_found)} territories, {len(products_found)} products, {len(data)} combinations")
-    return dict(data), sorted(periods), None
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    buffer.seek(0)
+    log("Excel file created successfully (openpyxl write-only)")
+    return buffer
 
 
-def create_excel_file(data: dict, periods: list, product_names: dict, error: str = None) -> io.BytesIO:
+def create_excel_file(keys: list, periods: list, values: np.ndarray, product_names: dict,
+                      error: str = None) -> io.BytesIO:
     """
     Create Excel file with data and metadata sheets.
     """
     log("Creating Excel file...")
     
-    # Create DataFrame
-    rows = []
-    for (territory, product) in sorted(data.keys()):
-        row = {
-            'TERRITORY': territory,
-            'TERRITORY_NAME': TERRITORY_NAMES.get(territory, territory),
-            'PRODUCT_TYPE': product,
-            'PRODUCT_NAME': product_names.get(product, product),
-        }
-        for period in periods:
-            row[period] = data[(territory, product)].get(period)
-        rows.append(row)
+    # Names are looked up once per distinct code (falling back to the code
+    # itself) and gathered per row by the factorized code, with no dict lookup per row
+    territories = [territory for territory, _ in keys]
+    products = [product for _, product in keys]
+    territory_idx, territory_codes = pd.factorize(np.asarray(territories, dtype=object))
+    product_idx, product_codes = pd.factorize(np.asarray(products, dtype=object))
+    territory_labels = np.array([TERRITORY_NAMES.get(code, code) for code in territory_codes], dtype=object)
+    product_labels = np.array([product_names.get(code, code) for code in product_codes], dtype=object)
     
-    df = pd.DataFrame(rows)
-    log(f"DataFrame created: {len(df)} rows x {len(df.columns)} columns")
+    # Label columns in sheet order (rows already sorted); the period values are
+    # written straight from the dense matrix, no DataFrame is built
+    label_columns = {
+        'TERRITORY': territories,
+        'TERRITORY_NAME': territory_labels[territory_idx].tolist(),
+        'PRODUCT_TYPE': products,
+        'PRODUCT_NAME': product_labels[product_idx].tolist()
+    }
     
-    # Get unique counts
-    n_territories = df['TERRITORY'].nunique() if len(df) > 0 else 0
-    n_products = df['PRODUCT_TYPE'].nunique() if len(df) > 0 else 0
+    # Metadata sheet: a fixed list of (field, value) rows written directly,
+    # no DataFrame needed for a two-column table of known shape
+    now = datetime.now()
+    metadata = [
+        ('edition', ''),
+        ('edition_type', 'DateDownload'),
+        ('download_date', now.strftime('%Y-%m-%d %H:%M:%S')),
+        ('source_path', SOURCE_PATH),
+        ('source_path_it', SOURCE_PATH_IT),
+        ('dataflow_id', DATAFLOW_ID),
+        ('dataflow_url', STRUCTURE_URL.split('?')[0]),
+        ('measure', 'Index numbers'),
+        ('measure_code', '4'),
+        ('frequency', 'Monthly'),
+        ('frequency_code', 'M'),
+        ('base_year', '2015'),
+        ('territories', 'IT (Italia), ITC (Nord-ovest), ITD (Nord-est), ITE (Centro), ITF (Sud), ITG (Isole)'),
+        ('start_period', periods[0] if periods else ''),
+        ('end_period', periods[-1] if periods else ''),
+        ('n_territories', len(territory_codes)),
+        ('n_product_types', len(product_codes)),
+        ('n_combinations', len(keys)),
+        ('n_periods', len(periods)),
+        ('errors', error if error else 'None')
+    ]
+    
+    if not HAS_XLSXWRITER:
+        return write_excel_openpyxl(label_columns, periods, values, metadata)
     
-    # Create Excel
+    # Create Excel (xlsxwriter streams the sheet XML, no per-cell objects like
+    # openpyxl; URLs in the metadata stay plain strings as before)
     buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
-        # Data sheet
-        df.to_excel(writer, sheet_name='Data', index=False)
-        
-        # Format data sheet
-        ws = writer.sheets['Data']
-        for col_idx, col in enumerate(df.columns, 1):
-            col_letter = get_column_letter(col_idx)
-            if col in ['TERRITORY', 'PRODUCT_TYPE']:
-                ws.column_dimensions[col_letter].width = 15
-            elif col in ['TERRITORY_NAME', 'PRODUCT_NAME']:
-                ws.column_dimensions[col_letter].width = 50
-            else:
-                ws.column_dimensions[col_letter].width = 10
+    with pd.ExcelWriter(buffer, engine='xlsxwriter',
+                        engine_kwargs={'options': {'strings_to_urls': False}}) as writer:
+        # Data sheet: written column by column straight from the label lists
+        # and the (already sorted) matrix; missing values become None, which
+        # xlsxwriter leaves as empty cells
+        ws = writer.book.add_worksheet('Data')
+        ws.write_row(0, 0, list(label_columns) + list(periods))
+        for col_idx, column in enumerate(label_columns.values()):
+            ws.write_column(1, col_idx, column)
+        n_labels = len(label_columns)
+        cells = np.where(np.isnan(values), None, values)
+        for col_idx in range(len(periods)):
+            ws.write_column(1, n_labels + col_idx, cells[:, col_idx].tolist())
+        log(f"Data sheet written: {len(keys)} rows x {n_labels + len(periods)} columns")
         
-        # Metadata sheet
-        now = datetime.now()
-        metadata = {
-            'Field': [
-                'edition',
-                'edition_type',
-                'download_date',
-                'source_path',
-                'source_path_it',
-                'dataflow_id',
-                'dataflow_url',
-                'measure',
-                'measure_code',
-                'frequency',
-                'frequency_code',
-                'base_year',
-                'territories',
-                'start_period',
-                'end_period',
-                'n_territories',
-                'n_product_types',
-                'n_combinations',
-                'n_periods',
-                'errors'
-            ],
-            'Value': [
-                '',
-                'DateDownload',
-                now.strftime('%Y-%m-%d %H:%M:%S'),
-                SOURCE_PATH,
-                SOURCE_PATH_IT,
-                DATAFLOW_ID,
-                STRUCTURE_URL.split('?')[0],
-                'Index numbers',
-                '4',
-                'Monthly',
-                'M',
-                '2015',
-                'IT (Italia), ITC (Nord-ovest), ITD (Nord-est), ITE (Centro), ITF (Sud), ITG (Isole)',
-                periods[0] if periods else '',
-                periods[-1] if periods else '',
-                n_territories,
-                n_products,
-                len(df),
-                len(periods),
-                error if error else 'None'
-            ]
-        }
-        meta_df = pd.DataFrame(metadata)
-        meta_df.to_excel(writer, sheet_name='Metadata', index=False)
+        # Format data sheet: label columns from the width map, then one range
+        # call for all period columns whatever their number
+        for col_idx, width in enumerate(LABEL_COLUMN_WIDTHS.values()):
+            ws.set_column(col_idx, col_idx, width)
+        if periods:
+            ws.set_column(n_labels, n_labels + len(periods) - 1, PERIOD_COLUMN_WIDTH)
         
-        # Format metadata sheet
-        ws_meta = writer.sheets['Metadata']
-        ws_meta.column_dimensions['A'].width = 20
-        ws_meta.column_dimensions['B'].width = 100
-        for row in ws_meta.iter_rows(min_row=2, max_col=2):
-            for cell in row:
-                cell.alignment = Alignment(wrap_text=True)
+        # Metadata sheet: only the value rows wrap, the header row is written
+        # without a format (a column format would apply to it as well)
+        ws_meta = writer.book.add_worksheet('Metadata')
+        wrap_format = writer.book.add_format({'text_wrap': True})
+        ws_meta.set_column(0, 0, 20)
+        ws_meta.set_column(1, 1, 100)
+        ws_meta.write_row(0, 0, ['Field', 'Value'])
+        for row_idx, row in enumerate(metadata, 1):
+            ws_meta.write_row(row_idx, 0, row, wrap_format)
     
     buffer.seek(0)
     log("Excel file created successfully")
@@ -344,37 +651,41 @@ def run_pipeline() -> dict:
     }
     
     try:
-        # 1. Fetch code labels
-        product_names = fetch_codelist_names()
+        # 1-2. Fetch code labels and download data (single request) concurrently:
+        # the two calls are independent, so the structure request hides behind
+        # the much larger data download
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            names_future = executor.submit(fetch_codelist_names)
+            data_future = executor.submit(download_nic_data)
+            product_names = names_future.result()
+            keys, periods, values, error = data_future.result()
+        
         if not product_names:
             log("WARNING: Could not fetch product labels, using codes as names")
         
-        # 2. Download data (single request)
-        data, periods, error = download_nic_data()
-        
-        if not data:
+        if not keys:
             result['message'] = f'Download failed: {error}'
             log(f"ERROR: {result['message']}")
             return result
         
         # 3. Create Excel file
-        buffer = create_excel_file(data, periods, product_names, error)
+        buffer = create_excel_file(keys, periods, values, product_names, error)
         
         # 4. Get unique counts
-        territories = set(t for t, p in data.keys())
-        products = set(p for t, p in data.keys())
+        territories = set(t for t, p in keys)
+        products = set(p for t, p in keys)
         
         # 5. Prepare result
         elapsed = time.time() - start_time
         
         result['status'] = 'success'
-        result['message'] = f'Downloaded {len(territories)} territories, {len(products)} products, {len(data)} combinations in {elapsed:.1f}s'
+        result['message'] = f'Downloaded {len(territories)} territories, {len(products)} products, {len(keys)} combinations in {elapsed:.1f}s'
         result['buffer'] = buffer
         result['folder_id'] = OUTPUT_FOLDER_ID
         result['metadata'] = {
             'n_territories': len(territories),
             'n_products': len(products),
-            'n_combinations': len(data),
+            'n_combinations': len(keys),
             'n_periods': len(periods),
             'period_range': f"{periods[0]} → {periods[-1]}" if periods else '',
             'elapsed_seconds': round(elapsed, 1)